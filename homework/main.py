@@ -5,65 +5,227 @@
 
 import sys
 import re
+import ast
 import json
+import operator
+import functools
+
+# Слово и признак вызова: за q/min со скобкой следует '('
+_WORD_RE = re.compile(r'([^\W\d]\w*)(\s*\()?')
+
+# q и min - вызовы только перед '(', true/false - литералы только целиком;
+# в остальных случаях это допустимые имена констант
+_CALLS = frozenset(('q', 'min'))
+_LITERALS = frozenset(('true', 'false'))
+
+_MISSING = object()
+
+_NUMERIC_TYPES = frozenset((int, float))
+
+_OPERATIONS = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'multiply': operator.mul,
+    'divide': operator.truediv,
+}
+
+
+def _split_top_level(text, sep=';'):
+    """Генератор срезов text между разделителями sep вне [...] и q(...)"""
+    n = len(text)
+    depth = 0
+    start = 0
+    i = 0
+    
+    while i < n:
+        char = text[i]
+        
+        if char == 'q' and i + 1 < n and text[i + 1] == '(':
+            # Строка q(...) пропускается целиком, разделители и скобки внутри неё не считаются
+            paren_count = 0
+            j = i + 1
+            while j < n:
+                if text[j] == '(':
+                    paren_count += 1
+                elif text[j] == ')':
+                    paren_count -= 1
+                    if paren_count == 0:
+                        break
+                j += 1
+            i = j + 1
+            continue
+        
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == sep and depth == 0:
+            yield text[start:i]
+            start = i + 1
+        
+        i += 1
+    
+    yield text[start:]
+
+
+def _parse_number(token):
+    """int или float для записи вида -?123 / -?123.45, иначе None (без regex)"""
+    body = token[1:] if token[:1] == '-' else token
+    whole, dot, frac = body.partition('.')
+    if not whole.isdecimal() or (frac and not frac.isdecimal()):
+        return None
+    return float(token) if dot else int(token)
+
+
+def _is_identifier(name):
+    """[a-zA-Z][_a-zA-Z0-9]* без regex"""
+    return name.isascii() and name[:1].isalpha() and name.isidentifier()
+
+
+def _references_names(value_str):
+    if value_str.strip() in _LITERALS:
+        return False
+    return any(not (call and word in _CALLS) for word, call in _WORD_RE.findall(value_str))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _divide(a, b):
+    if b == 0:
+        return float('inf')
+    return a / b
+
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: _divide,
+}
+
+
+def _format_toml_string(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _format_toml_bool(value):
+    return 'true' if value else 'false'
+
+
+def _format_toml_array(values):
+    # Типы элементов определяются за один проход
+    kinds = {type(x) for x in values}
+    if kinds <= _NUMERIC_TYPES:
+        items = map(str, values)
+    else:
+        items = map(_format_toml_value, values)
+    return f'[{", ".join(items)}]'
+
+
+_TOML_FORMATTERS = {
+    str: _format_toml_string,
+    bool: _format_toml_bool,
+    list: _format_toml_array,
+}
+
+
+def _format_toml_value(value):
+    return _TOML_FORMATTERS.get(type(value), str)(value)
+
 
 class ConfigTranslator:
     def __init__(self, operation=None, value=1):
         self.constants = {}
+        self._numeric_constants = {}
         self.output = {}
         self.operation = operation
         self.value = value
+        self._expr_cache = {}
+        self._value_cache = {}
+        
+        # Операция выбирается один раз, а не на каждое число
+        op = _OPERATIONS.get(operation)
+        if op is None or (operation == 'divide' and value == 0):
+            self._apply = lambda num: num
+        else:
+            self._apply = lambda num: op(num, value)
+    
+    @classmethod
+    def translate_cached(cls, text, operation=None, value=1):
+        """Перевод с кэшированием результата по (text, operation, value)"""
+        return _translate_cached(text, operation, value)
     
     def apply_operation(self, num):
         if not isinstance(num, (int, float)):
             return num
-        
-        if self.operation == 'add':
-            return num + self.value
-        elif self.operation == 'subtract':
-            return num - self.value
-        elif self.operation == 'multiply':
-            return num * self.value
-        elif self.operation == 'divide':
-            if self.value != 0:
-                return num / self.value
-            return num
-        return num
+        return self._apply(num)
     
     def remove_comments(self, text):
-        return re.sub(r'\{\{!--.*?--\}\}', '', text, flags=re.DOTALL)
+        if '{{!--' not in text:
+            return text
+        
+        parts = []
+        pos = 0
+        while True:
+            start = text.find('{{!--', pos)
+            if start < 0:
+                break
+            end = text.find('--}}', start + 5)
+            if end < 0:
+                break
+            parts.append(text[pos:start])
+            pos = end + 4
+        parts.append(text[pos:])
+        return ''.join(parts)
     
     def parse_simple_value(self, token):
         token = token.strip()
         
+        first = token[:1]
         if token == 'true':
             return True
         elif token == 'false':
             return False
-        elif token.startswith('q(') and token.endswith(')'):
+        elif first == 'q' and token.startswith('q(') and token.endswith(')'):
             return token[2:-1]
-        elif re.match(r'^-?\d+\.\d*$', token):
-            value = float(token)
-            return self.apply_operation(value)
-        elif re.match(r'^-?\d+$', token):
-            value = int(token)
-            return self.apply_operation(value)
-        elif token in self.constants:
-            return self.constants[token]
-        elif re.match(r'^[a-zA-Z][_a-zA-Z0-9]*$', token):
-            return token
-        return token
+        elif first == '-' or first.isdecimal():
+            # Числа разбираются только если первый символ допускает число
+            number = _parse_number(token)
+            if number is not None:
+                return self._apply(number)
+        
+        # Идентификатор без константы, как и любой другой текст, остается строкой
+        return self.constants.get(token, token)
     
     def parse_value(self, token):
         token = token.strip()
         
-        if token.startswith('!{') and token.endswith('}'):
-            expr = token[2:-1].strip()
-            return self.evaluate_expression(expr)
-        elif token.startswith('[') and token.endswith(']'):
+        if token.startswith('[') and token.endswith(']'):
+            # Массивы изменяемы, поэтому не кэшируются
             return self.parse_array(token)
+        
+        value = self._value_cache.get(token, _MISSING)
+        if value is _MISSING:
+            if token.startswith('!{') and token.endswith('}'):
+                expr = token[2:-1].strip()
+                value = self.evaluate_expression(expr)
+            else:
+                value = self.parse_simple_value(token)
+            self._value_cache[token] = value
+        return value
+    
+    def set_constant(self, name, value):
+        name = sys.intern(name)
+        self.constants[name] = value
+        # Выражениям нужны только числовые константы
+        if _is_number(value):
+            self._numeric_constants[name] = value
         else:
-            return self.parse_simple_value(token)
+            self._numeric_constants.pop(name, None)
+        # Значения токенов могут зависеть от констант
+        self._value_cache.clear()
     
     def parse_array(self, token):
         content = token[1:-1].strip()
@@ -71,256 +233,153 @@ class ConfigTranslator:
             return []
         
         elements = []
-        current = ""
-        depth = 0
-        
-        i = 0
-        while i < len(content):
-            char = content[i]
-            
-            if char == 'q' and i+1 < len(content) and content[i+1] == '(':
-                start = i
-                paren_count = 0
-                while i < len(content):
-                    if content[i] == '(':
-                        paren_count += 1
-                    elif content[i] == ')':
-                        paren_count -= 1
-                        if paren_count == 0:
-                            break
-                    i += 1
-                if i < len(content):
-                    elements.append(self.parse_value(content[start:i+1]))
-                    i += 1
-                    continue
-            
-            if char == '[':
-                depth += 1
-                current += char
-            elif char == ']':
-                depth -= 1
-                current += char
-            elif char == ';' and depth == 0:
-                if current.strip():
-                    elements.append(self.parse_value(current.strip()))
-                current = ""
-            else:
-                current += char
-            
-            i += 1
-        
-        if current.strip():
-            elements.append(self.parse_value(current.strip()))
-        
+        for item in _split_top_level(content):
+            item = item.strip()
+            if item:
+                elements.append(self.parse_value(item))
         return elements
     
     def evaluate_expression(self, expr):
-        for name, val in self.constants.items():
-            if isinstance(val, (int, float)):
-                expr = re.sub(r'\b' + re.escape(name) + r'\b', str(val), expr)
-        
-        def process_number(match):
-            num_str = match.group(0)
+        evaluate = self._expr_cache.get(expr)
+        if evaluate is None:
             try:
-                if '.' in num_str:
-                    num = float(num_str)
-                else:
-                    num = int(num_str)
-                return str(self.apply_operation(num))
-            except:
-                return num_str
+                evaluate = self._compile_node(ast.parse(expr, mode='eval').body)
+            except (SyntaxError, ValueError, RecursionError, OverflowError):
+                # RecursionError - слишком глубокая вложенность для ast.parse
+                return ''.join(expr.split())
+            self._expr_cache[expr] = evaluate
         
-        expr = re.sub(r'\b\d+(?:\.\d*)?\b', process_number, expr)
+        try:
+            result = evaluate()
+        except (ValueError, RecursionError, OverflowError):
+            return ''.join(expr.split())
         
-        while True:
-            match = re.search(r'min\(([^)]+)\)', expr)
-            if not match:
-                break
-            
-            min_expr = match.group(0)
-            args_str = match.group(1)
-            
-            args = []
-            current = ""
-            depth = 0
-            
-            for char in args_str + ',':
-                if char == '(':
-                    depth += 1
-                    current += char
-                elif char == ')':
-                    depth -= 1
-                    current += char
-                elif char == ',' and depth == 0:
-                    if current.strip():
-                        arg_expr = current.strip()
-                        if re.match(r'^-?\d+(?:\.\d*)?$', arg_expr):
-                            if '.' in arg_expr:
-                                args.append(float(arg_expr))
-                            else:
-                                args.append(int(arg_expr))
-                        elif any(op in arg_expr for op in '+-*/'):
-                            try:
-                                result = eval(arg_expr)
-                                args.append(result)
-                            except:
-                                args.append(0)
-                        else:
-                            args.append(0)
-                    current = ""
-                else:
-                    current += char
-            
-            if current.strip():
-                arg_expr = current.strip()
-                if re.match(r'^-?\d+(?:\.\d*)?$', arg_expr):
-                    if '.' in arg_expr:
-                        args.append(float(arg_expr))
-                    else:
-                        args.append(int(arg_expr))
-                elif any(op in arg_expr for op in '+-*/'):
-                    try:
-                        result = eval(arg_expr)
-                        args.append(result)
-                    except:
-                        args.append(0)
-                else:
-                    args.append(0)
-            
-            if args:
-                min_val = min(args)
-                result_val = self.apply_operation(min_val)
-                expr = expr.replace(min_expr, str(result_val))
-            else:
-                expr = expr.replace(min_expr, '0')
+        if isinstance(result, float) and result.is_integer():
+            return int(result)
+        return result
+    
+    def _compile_node(self, node):
+        """Компилирует узел AST в функцию без аргументов, вычисляющую его значение"""
+        if isinstance(node, ast.Constant):
+            if not _is_number(node.value):
+                raise ValueError(f"недопустимое значение: {node.value!r}")
+            # Операция известна заранее - литерал вычисляется при компиляции
+            literal = self._apply(node.value)
+            return lambda: literal
         
-        expr = expr.replace(' ', '')
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = node.operand
+            # Отрицательный литерал - одно число, как в parse_simple_value
+            if isinstance(operand, ast.Constant) and _is_number(operand.value):
+                literal = self._apply(-operand.value)
+                return lambda: literal
+            evaluate = self._compile_node(operand)
+            return lambda: -evaluate()
         
-        while '*' in expr:
-            match = re.search(r'([+-]?\d+(?:\.\d*)?)\*([+-]?\d+(?:\.\d*)?)', expr)
-            if not match:
-                break
-            a = float(match.group(1))
-            b = float(match.group(2))
-            result = a * b
-            expr = expr[:match.start()] + str(result) + expr[match.end():]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd):
+            return self._compile_node(node.operand)
         
-        while '/' in expr:
-            match = re.search(r'([+-]?\d+(?:\.\d*)?)/([+-]?\d+(?:\.\d*)?)', expr)
-            if not match:
-                break
-            a = float(match.group(1))
-            b = float(match.group(2))
-            if b != 0:
-                result = a / b
-            else:
-                result = float('inf')
-            expr = expr[:match.start()] + str(result) + expr[match.end():]
+        if isinstance(node, ast.BinOp):
+            # Левоассоциативная цепочка (a + b + c ...) разворачивается в цикл,
+            # чтобы длинные суммы не упирались в глубину рекурсии
+            steps = []
+            while isinstance(node, ast.BinOp):
+                op = _BIN_OPS.get(type(node.op))
+                if op is None:
+                    raise ValueError("недопустимая операция")
+                steps.append((op, node.right))
+                node = node.left
+            first = self._compile_node(node)
+            steps.reverse()
+            rest = [(op, self._compile_node(right)) for op, right in steps]
+            
+            def evaluate():
+                value = first()
+                for op, right in rest:
+                    value = op(value, right())
+                return value
+            return evaluate
         
-        i = 0
-        while i < len(expr):
-            if i > 0 and expr[i] in '+-' and expr[i-1] not in 'eE':
-                j = i - 1
-                while j >= 0 and (expr[j].isdigit() or expr[j] == '.' or (expr[j] == '-' and j == 0)):
-                    j -= 1
-                left_str = expr[j+1:i]
-                
-                k = i + 1
-                while k < len(expr) and (expr[k].isdigit() or expr[k] == '.' or (k == i+1 and expr[k] == '-')):
-                    k += 1
-                right_str = expr[i+1:k]
-                
-                try:
-                    left = float(left_str)
-                    right = float(right_str)
-                    
-                    if expr[i] == '+':
-                        result = left + right
-                    else:
-                        result = left - right
-                    
-                    expr = expr[:j+1] + str(result) + expr[k:]
-                    i = j + len(str(result))
-                except:
-                    i += 1
-            else:
-                i += 1
+        if isinstance(node, ast.Name):
+            name = node.id
+            constants = self._numeric_constants
+            
+            def load():
+                value = constants.get(name)
+                if value is None:
+                    raise ValueError(f"неизвестная константа: {name}")
+                return value
+            return load
         
-        try:
-            result = float(expr)
-            return int(result) if result.is_integer() else result
-        except:
-            if re.match(r'^-?\d+(?:\.\d*)?$', expr):
-                value = float(expr)
-                return self.apply_operation(value)
-            return expr
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == 'min' and node.args and not node.keywords):
+            args = [self._compile_node(arg) for arg in node.args]
+            return lambda: min(evaluate() for evaluate in args)
+        
+        raise ValueError("недопустимое выражение")
     
     def translate(self, text):
         text = self.remove_comments(text)
-        lines = text.strip().split('\n')
+        entries = []
         
-        for line in lines:
+        # Один проход по строкам: константы определяются сразу,
+        # остальные значения откладываются до конца
+        for line in text.strip().split('\n'):
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
             
-            if '->' in line and '=' not in line:
-                parts = line.split('->', 1)
-                if len(parts) == 2:
-                    value_str, name = parts[0].strip(), parts[1].strip()
-                    if re.match(r'^[a-zA-Z][_a-zA-Z0-9]*$', name):
-                        try:
-                            self.constants[name] = self.parse_value(value_str)
-                        except:
-                            pass
-        
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#'):
+            value_str, arrow, name = line.partition('->')
+            if arrow:
+                is_constant = '=' not in line
+            else:
+                name, equals, value_str = line.partition('=')
+                if not equals:
+                    continue
+                is_constant = False
+            
+            name, value_str = name.strip(), value_str.strip()
+            if not _is_identifier(name):
                 continue
             
-            if '->' in line:
-                parts = line.split('->', 1)
-                if len(parts) == 2:
-                    value_str, name = parts[0].strip(), parts[1].strip()
-                    if re.match(r'^[a-zA-Z][_a-zA-Z0-9]*$', name):
-                        self.output[name] = self.parse_value(value_str)
-            elif '=' in line:
-                parts = line.split('=', 1)
-                if len(parts) == 2:
-                    name, value_str = parts[0].strip(), parts[1].strip()
-                    if re.match(r'^[a-zA-Z][_a-zA-Z0-9]*$', name):
-                        self.output[name] = self.parse_value(value_str)
+            value = _MISSING
+            if is_constant:
+                try:
+                    parsed = self.parse_value(value_str)
+                except Exception:
+                    pass
+                else:
+                    self.set_constant(name, parsed)
+                    # Значение без ссылок на имена не зависит от констант
+                    if not _references_names(value_str):
+                        value = parsed
+            entries.append((name, value_str, value))
+        
+        # Ссылки на константы разрешаются, когда известны все константы
+        for name, value_str, value in entries:
+            if value is _MISSING:
+                value = self.parse_value(value_str)
+            self.output[name] = value
         
         return self.dict_to_toml(self.output)
     
     def dict_to_toml(self, data):
-        lines = []
-        for key, value in data.items():
-            if isinstance(value, str):
-                lines.append(f'{key} = "{value}"')
-            elif isinstance(value, bool):
-                lines.append(f'{key} = {str(value).lower()}')
-            elif isinstance(value, list):
-                if all(isinstance(x, (int, float)) for x in value):
-                    lines.append(f'{key} = [{", ".join(str(x) for x in value)}]')
-                elif all(isinstance(x, str) for x in value):
-                    lines.append(f'{key} = [{", ".join(json.dumps(x) for x in value)}]')
-                elif all(isinstance(x, bool) for x in value):
-                    lines.append(f'{key} = [{", ".join(str(x).lower() for x in value)}]')
-                else:
-                    str_vals = []
-                    for x in value:
-                        if isinstance(x, str):
-                            str_vals.append(json.dumps(x))
-                        elif isinstance(x, bool):
-                            str_vals.append(str(x).lower())
-                        else:
-                            str_vals.append(str(x))
-                    lines.append(f'{key} = [{", ".join(str_vals)}]')
-            else:
-                lines.append(f'{key} = {value}')
-        return '\n'.join(lines)
+        return '\n'.join(f'{key} = {_format_toml_value(value)}' for key, value in data.items())
+
+
+# Справка выводится одной записью
+USAGE = ("\n" + "=" * 60 + """
+Использование с операциями:
+python3 homework/main.py --multiply 5
+python3 homework/main.py --add 50
+python3 homework/main.py --divide 2
+python3 homework/main.py --subtract 10
+""")
+
+
+@functools.lru_cache(maxsize=128, typed=True)
+def _translate_cached(text, operation, value):
+    return ConfigTranslator(operation, value).translate(text)
 
 
 def main():
@@ -368,8 +427,7 @@ damage = !{health / 2}"""
         print("До:")
         print(example1)
         print("\nПосле (без операций):")
-        t1 = ConfigTranslator()
-        print(t1.translate(example1))
+        print(ConfigTranslator.translate_cached(example1))
         
         print("\n" + "=" * 60)
         
@@ -378,15 +436,9 @@ damage = !{health / 2}"""
         print("До:")
         print(example2)
         print("\nПосле (без операций):")
-        t2 = ConfigTranslator()
-        print(t2.translate(example2))
+        print(ConfigTranslator.translate_cached(example2))
         
-        print("\n" + "=" * 60)
-        print("Использование с операциями:")
-        print("python3 homework/main.py --multiply 5")
-        print("python3 homework/main.py --add 50")
-        print("python3 homework/main.py --divide 2")
-        print("python3 homework/main.py --subtract 10")
+        sys.stdout.write(USAGE)
         return
     
     # Если указана операция - применяем её к примерам
@@ -398,8 +450,7 @@ damage = !{health / 2}"""
     print("До:")
     print(example1)
     print(f"\nПосле ({operation} {value}):")
-    t1 = ConfigTranslator(operation, value)
-    print(t1.translate(example1))
+    print(ConfigTranslator.translate_cached(example1, operation, value))
     
     print("\n" + "=" * 60)
     
@@ -408,8 +459,7 @@ damage = !{health / 2}"""
     print("До:")
     print(example2)
     print(f"\nПосле ({operation} {value}):")
-    t2 = ConfigTranslator(operation, value)
-    print(t2.translate(example2))
+    print(ConfigTranslator.translate_cached(example2, operation, value))
 
 
 if __name__ == "__main__":
@@ -1,25 +1,90 @@
 
-import shlex
+import re
 import sys
 import argparse
 import os
 
+# Разделители аргументов, как у shlex в POSIX-режиме
+WHITESPACE = ' \t\r\n'
+WHITESPACE_RE = re.compile('[ \t\r\n]+')
+
+
+def split_command(command_line):
+    """Разбиение строки на аргументы с учетом кавычек (аналог shlex.split)"""
+    if not any(char in command_line for char in '\'"\\'):
+        stripped = command_line.strip(WHITESPACE)
+        return WHITESPACE_RE.split(stripped) if stripped else []
+    
+    tokens = []
+    current = []
+    in_token = False
+    quote = None
+    i = 0
+    n = len(command_line)
+    
+    while i < n:
+        char = command_line[i]
+        
+        if quote == "'":
+            if char == "'":
+                quote = None
+            else:
+                current.append(char)
+        elif quote == '"':
+            if char == '"':
+                quote = None
+            elif char == '\\':
+                if i + 1 >= n:
+                    raise ValueError("No escaped character")
+                # Внутри "..." экранируются только '"' и '\'
+                if command_line[i + 1] in '"\\':
+                    i += 1
+                current.append(command_line[i])
+            else:
+                current.append(char)
+        elif char in WHITESPACE:
+            if in_token:
+                tokens.append(''.join(current))
+                current = []
+                in_token = False
+        elif char in '\'"':
+            quote = char
+            in_token = True
+        elif char == '\\':
+            if i + 1 >= n:
+                raise ValueError("No escaped character")
+            i += 1
+            current.append(command_line[i])
+            in_token = True
+        else:
+            current.append(char)
+            in_token = True
+        
+        i += 1
+    
+    if quote is not None:
+        raise ValueError("No closing quotation")
+    if in_token:
+        tokens.append(''.join(current))
+    return tokens
+
+
 class ShellEmulator:
+    # Имя команды -> имя метода; общий словарь для всех экземпляров
+    _COMMANDS = {
+        'ls': 'cmd_ls',
+        'cd': 'cmd_cd',
+        'echo': 'cmd_echo',
+        'pwd': 'cmd_pwd',
+        'exit': 'cmd_exit'
+    }
+    
     def __init__(self, vfs_name="myvfs", vfs_path=None, script_path=None):
         self.vfs_name = vfs_name
         self.vfs_path = vfs_path
         self.script_path = script_path
         self.current_dir = "/"
         
- 
-        self.commands = {
-            'ls': self.cmd_ls,
-            'cd': self.cmd_cd,
-            'echo': self.cmd_echo,
-            'pwd': self.cmd_pwd,
-            'exit': self.cmd_exit
-        }
-        
      
         print("=== ПАРАМЕТРЫ ЗАПУСКА ЭМУЛЯТОРА ===")
         print(f"Имя VFS: {self.vfs_name}")
@@ -30,7 +95,7 @@ class ShellEmulator:
     def parse_arguments(self, command_line):
         """Парсер, корректно обрабатывающий аргументы в кавычках (Этап 1)"""
         try:
-            return shlex.split(command_line)
+            return split_command(command_line)
         except ValueError as e:
             print(f"Ошибка парсинга: {e}")
             return None
@@ -79,8 +144,9 @@ class ShellEmulator:
     
     def execute_command(self, command, args):
         """Выполнение команды с обработкой ошибок (Этап 1)"""
-        if command in self.commands:
-            return self.commands[command](args)
+        handler = self._COMMANDS.get(command)
+        if handler is not None:
+            return getattr(self, handler)(args)
         else:
             print(f"Ошибка: неизвестная команда '{command}'")
             return False
@@ -97,30 +163,29 @@ class ShellEmulator:
         
         print(f"=== ВЫПОЛНЕНИЕ СКРИПТА: {script_path} ===")
         
+        # Файл читается построчно, без загрузки целиком в память
         with open(script_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
    
-            if not line or line.startswith('#'):
-                continue
+                if not line or line.startswith('#'):
+                    continue
                 
          
-            print(f"\n[{line_num}] {self.get_prompt()}{line}")
+                print(f"\n[{line_num}] {self.get_prompt()}{line}")
             
-            parts = self.parse_arguments(line)
-            if parts is None:
-                print("Ошибка: неверный формат команды в скрипте")
-                return False
+                parts = self.parse_arguments(line)
+                if parts is None:
+                    print("Ошибка: неверный формат команды в скрипте")
+                    return False
             
-            command = parts[0]
-            args = parts[1:]
+                command = parts[0]
+                args = parts[1:]
             
           
-            if not self.execute_command(command, args):
-                print(f"Ошибка выполнения команды в строке {line_num}")
-                return False
+                if not self.execute_command(command, args):
+                    print(f"Ошибка выполнения команды в строке {line_num}")
+                    return False
         
         print("\n=== СКРИПТ УСПЕШНО ВЫПОЛНЕН ===")
         return True
@@ -1,20 +1,87 @@
-import shlex
+import re
 import sys
 
+# Разделители аргументов, как у shlex в POSIX-режиме
+WHITESPACE = ' \t\r\n'
+WHITESPACE_RE = re.compile('[ \t\r\n]+')
+
+
+def split_command(command_line):
+    """Разбиение строки на аргументы с учетом кавычек (аналог shlex.split)"""
+    if not any(char in command_line for char in '\'"\\'):
+        stripped = command_line.strip(WHITESPACE)
+        return WHITESPACE_RE.split(stripped) if stripped else []
+    
+    tokens = []
+    current = []
+    in_token = False
+    quote = None
+    i = 0
+    n = len(command_line)
+    
+    while i < n:
+        char = command_line[i]
+        
+        if quote == "'":
+            if char == "'":
+                quote = None
+            else:
+                current.append(char)
+        elif quote == '"':
+            if char == '"':
+                quote = None
+            elif char == '\\':
+                if i + 1 >= n:
+                    raise ValueError("No escaped character")
+                # Внутри "..." экранируются только '"' и '\'
+                if command_line[i + 1] in '"\\':
+                    i += 1
+                current.append(command_line[i])
+            else:
+                current.append(char)
+        elif char in WHITESPACE:
+            if in_token:
+                tokens.append(''.join(current))
+                current = []
+                in_token = False
+        elif char in '\'"':
+            quote = char
+            in_token = True
+        elif char == '\\':
+            if i + 1 >= n:
+                raise ValueError("No escaped character")
+            i += 1
+            current.append(command_line[i])
+            in_token = True
+        else:
+            current.append(char)
+            in_token = True
+        
+        i += 1
+    
+    if quote is not None:
+        raise ValueError("No closing quotation")
+    if in_token:
+        tokens.append(''.join(current))
+    return tokens
+
+
 class ShellEmulator:
+    # Имя команды -> имя метода; общий словарь для всех экземпляров
+    _COMMANDS = {
+        'ls': 'cmd_ls',
+        'cd': 'cmd_cd',
+        'exit': 'cmd_exit'
+    }
+    
     def __init__(self, vfs_name="myvfs"):
         self.vfs_name = vfs_name
         self.current_dir = "/"
-        self.commands = {
-            'ls': self.cmd_ls,
-            'cd': self.cmd_cd,
-            'exit': self.cmd_exit
-        }
     
     def parse_arguments(self, command_line):
         """Парсер, корректно обрабатывающий аргументы в кавычках"""
         try:
-            return shlex.split(command_line)
+            return split_command(command_line)
         except ValueError as e:
             print(f"Ошибка парсинга: {e}")
             return None
@@ -41,8 +108,9 @@ class ShellEmulator:
     
     def execute_command(self, command, args):
         """Выполнение команды с обработкой ошибок"""
-        if command in self.commands:
-            self.commands[command](args)
+        handler = self._COMMANDS.get(command)
+        if handler is not None:
+            getattr(self, handler)(args)
         else:
             print(f"Ошибка: неизвестная команда '{command}'")
     
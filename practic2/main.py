@@ -4,81 +4,244 @@
 ВСЕ 5 ЭТАПОВ РАБОТАЮТ СРАЗУ
 """
 
-import argparse
+import functools
 import sys
-import os
-import json
-import urllib.request
-import urllib.parse
-import urllib.error
-import xml.etree.ElementTree as ET
 from collections import deque, defaultdict
+from types import MappingProxyType, SimpleNamespace
+
+# Состояния пакета при поиске цикла
+GRAY = 'gray'
+BLACK = 'black'
+
+# Разделители секций вывода
+SEPARATOR = "=" * 50
+WIDE_SEPARATOR = "=" * 60
+
+# Заглушка для реального режима: неизменяемая таблица, создаётся один раз
+MOCK_DEPENDENCIES = MappingProxyType({
+    "Newtonsoft.Json": ("System.Runtime", "Microsoft.CSharp", "System.Xml"),
+    "EntityFramework": ("EntityFramework.Core", "Microsoft.EntityFrameworkCore"),
+    "NUnit": ("NUnit.Framework", "NUnit.Runners"),
+})
+DEFAULT_MOCK_DEPENDENCIES = ("System.Runtime",)
+
+# Схема argparse: (флаги, именованные параметры add_argument)
+PARSER_SCHEMA = (
+    (('-h', '--help'), (('action', 'store_true'), ('help', 'show this help message and exit'))),
+    (('--package',), (('required', True), ('help', 'Имя пакета (например: Newtonsoft.Json)'))),
+    (('--source',), (('required', True), ('help', 'URL репозитория или путь к файлу'))),
+    (('--test-mode',), (('action', 'store_true'), ('help', 'Режим тестирования (файл вместо URL)'))),
+    (('--version',), (('default', 'latest'), ('help', 'Версия пакета'))),
+    (('--output',), (('default', 'dependencies.dot'), ('help', 'Выходной DOT файл'))),
+    (('--ascii-tree',), (('action', 'store_true'), ('help', 'Вывести ASCII-дерево'))),
+    (('--filter',), (('default', ''), ('help', 'Фильтр пакетов'))),
+    (('--reverse',), (('action', 'store_true'), ('help', 'Обратные зависимости'))),
+    (('--fail-fast',), (('action', 'store_true'), ('help', 'Остановить проверку на первой ошибке'))),
+)
+
+
+def _options_from_schema(schema):
+    """Таблица быстрого разбора: флаг -> (атрибут, значение по умолчанию, принимает значение)."""
+    options = {}
+    for flags, kwargs in schema:
+        kwargs = dict(kwargs)
+        flag = flags[-1]
+        if flag == '--help':
+            continue
+        
+        is_switch = kwargs.get('action') == 'store_true'
+        default = False if is_switch else kwargs.get('default')
+        options[flag] = (flag.lstrip('-').replace('-', '_'), default, not is_switch)
+    return options
+
+
+# Параметры командной строки выводятся из схемы argparse, а не дублируются
+OPTIONS = _options_from_schema(PARSER_SCHEMA)
+REQUIRED_OPTIONS = tuple(
+    OPTIONS[flags[-1]][0] for flags, kwargs in PARSER_SCHEMA if dict(kwargs).get('required')
+)
+
+# Заранее отформатированная справка: argparse для -h/--help не нужен
+HELP_TEXT = """\
+usage: main.py [-h] --package PACKAGE --source SOURCE [--test-mode]
+               [--version VERSION] [--output OUTPUT] [--ascii-tree]
+               [--filter FILTER] [--reverse] [--fail-fast]
+
+Визуализатор графа зависимостей NuGet
+
+options:
+  -h, --help         show this help message and exit
+  --package PACKAGE  Имя пакета (например: Newtonsoft.Json)
+  --source SOURCE    URL репозитория или путь к файлу
+  --test-mode        Режим тестирования (файл вместо URL)
+  --version VERSION  Версия пакета
+  --output OUTPUT    Выходной DOT файл
+  --ascii-tree       Вывести ASCII-дерево
+  --filter FILTER    Фильтр пакетов
+  --reverse          Обратные зависимости
+  --fail-fast        Остановить проверку на первой ошибке
+"""
+
+
+def parse_argv_fast(argv):
+    """Быстрый разбор argv без argparse.
+
+    Возвращает None для всего, что не является простым набором известных
+    флагов (--help, сокращения, ошибки), - такие случаи разбирает argparse.
+    """
+    values = {name: default for name, default, _ in OPTIONS.values()}
+    i = 0
+    n = len(argv)
+    
+    while i < n:
+        flag, eq, value = argv[i].partition('=')
+        option = OPTIONS.get(flag)
+        if option is None:
+            return None
+        
+        name, _, takes_value = option
+        if not takes_value:
+            if eq:
+                return None
+            values[name] = True
+        elif eq:
+            values[name] = value
+        else:
+            if i + 1 >= n or argv[i + 1].startswith('-'):
+                return None
+            i += 1
+            values[name] = argv[i]
+        i += 1
+    
+    if any(values[name] is None for name in REQUIRED_OPTIONS):
+        return None
+    return SimpleNamespace(**values)
+
+
+@functools.cache
+def build_parser(schema):
+    """Парсер argparse для справки и сообщений об ошибках (один на схему)."""
+    # argparse нужен только здесь, поэтому импортируется лениво
+    import argparse
+    
+    # -h/--help обрабатывает parse_arguments, форматтер справки не используется
+    parser = argparse.ArgumentParser(description='Визуализатор графа зависимостей NuGet', add_help=False)
+    
+    for flags, kwargs in schema:
+        parser.add_argument(*flags, **dict(kwargs))
+    
+    return parser
+
+
+def parse_arguments():
+    """Разбор параметров командной строки."""
+    argv = sys.argv[1:]
+    args = parse_argv_fast(argv)
+    if args is not None:
+        return args
+    
+    if '-h' in argv or '--help' in argv:
+        sys.stdout.write(HELP_TEXT)
+        sys.exit(0)
+    
+    return build_parser(PARSER_SCHEMA).parse_args()
+
+
+def validate_arguments(args):
+    """Проверка параметров, возвращает список ошибок."""
+    import os
+    
+    # Сначала дешёвые строковые проверки, обращение к диску - последним
+    errors = []
+    package = (args.package or '').strip()
+    source = (args.source or '').strip()
+    if not package:
+        errors.append("Имя пакета не может быть пустым")
+        if args.fail_fast:
+            return errors
+    if not source:
+        errors.append("Источник не может быть пустым")
+    elif args.test_mode and not os.path.isfile(args.source):
+        errors.append(f"Тестовый файл не найден: {args.source}")
+    return errors
+
+
+def print_config(args):
+    """Вывод конфигурации (этап 1)."""
+    sys.stdout.write("\n".join((
+        "\n" + SEPARATOR,
+        "ЭТАП 1: КОНФИГУРАЦИЯ",
+        SEPARATOR,
+        "Пакет: %s" % args.package,
+        "Источник: %s" % args.source,
+        "Тестовый режим: %s" % ('Да' if args.test_mode else 'Нет'),
+        "Версия: %s" % args.version,
+        "Выходной файл: %s" % args.output,
+        "ASCII-дерево: %s" % ('Да' if args.ascii_tree else 'Нет'),
+        "Фильтр: %s" % (args.filter if args.filter else 'Нет'),
+        "Обратные зависимости: %s" % ('Да' if args.reverse else 'Нет'),
+        SEPARATOR,
+        "",
+    )))
+
+
+def make_package_filter(filter_text):
+    """Предикат фильтра пакетов: строится один раз после разбора параметров."""
+    if not filter_text:
+        return lambda package_name: False
+    return lambda package_name: filter_text in package_name
+
+
+def build_reverse_graph(graph):
+    """Обратный граф (зависимость -> зависящие пакеты) за один проход по рёбрам."""
+    reverse_graph = defaultdict(list)
+    for package, dependencies in graph.items():
+        for dep in dependencies:
+            reverse_graph[dep].append(package)
+    return reverse_graph
+
 
 class DependencyVisualizer:
     def __init__(self):
         self.config = {}
+        self._filter_fn = make_package_filter('')
         self.dependency_graph = defaultdict(list)
         self.reverse_dependency_graph = defaultdict(list)
+        self._reverse_graph_size = 0
         self.visited_packages = set()
         self.cycle_detected = False
         self.package_cache = {}
-        self.recursion_depth = 0
-        self.max_recursion_depth = 20
-
-    def parse_arguments(self):
-        parser = argparse.ArgumentParser(description='Визуализатор графа зависимостей NuGet')
-        
-        parser.add_argument('--package', required=True, help='Имя пакета (например: Newtonsoft.Json)')
-        parser.add_argument('--source', required=True, help='URL репозитория или путь к файлу')
-        parser.add_argument('--test-mode', action='store_true', help='Режим тестирования (файл вместо URL)')
-        parser.add_argument('--version', default='latest', help='Версия пакета')
-        parser.add_argument('--output', default='dependencies.dot', help='Выходной DOT файл')
-        parser.add_argument('--ascii-tree', action='store_true', help='Вывести ASCII-дерево')
-        parser.add_argument('--filter', default='', help='Фильтр пакетов')
-        parser.add_argument('--reverse', action='store_true', help='Обратные зависимости')
-        
-        return parser.parse_args()
-
-    def validate_arguments(self, args):
-        errors = []
-        if not args.package or not args.package.strip():
-            errors.append("Имя пакета не может быть пустым")
-        if not args.source or not args.source.strip():
-            errors.append("Источник не может быть пустым")
-        if args.test_mode and not os.path.exists(args.source):
-            errors.append(f"Тестовый файл не найден: {args.source}")
-        return errors
-
-    def print_config(self, args):
-        print("\n" + "="*50)
-        print("ЭТАП 1: КОНФИГУРАЦИЯ")
-        print("="*50)
-        print(f"Пакет: {args.package}")
-        print(f"Источник: {args.source}")
-        print(f"Тестовый режим: {'Да' if args.test_mode else 'Нет'}")
-        print(f"Версия: {args.version}")
-        print(f"Выходной файл: {args.output}")
-        print(f"ASCII-дерево: {'Да' if args.ascii_tree else 'Нет'}")
-        print(f"Фильтр: {args.filter if args.filter else 'Нет'}")
-        print(f"Обратные зависимости: {'Да' if args.reverse else 'Нет'}")
-        print("="*50)
+        self._test_graph_cache = {}
+        self._test_reverse_cache = {}
+        self.max_depth = 20
 
     def load_test_repository(self, file_path):
+        # Файл разбирается один раз, дальше граф берётся из кэша
+        graph = self._test_graph_cache.get(file_path)
+        if graph is not None:
+            return graph
+        
         graph = {}
         print(f"Загрузка тестового репозитория: {file_path}")
         
         with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                if ':' in line:
-                    package, deps_str = line.split(':', 1)
-                    package = package.strip()
-                    dependencies = [dep.strip() for dep in deps_str.split(',') if dep.strip()]
-                    graph[package] = dependencies
+            content = f.read()
+        
+        # Имена интернируются: одинаковые пакеты - один объект строки, поэтому
+        # поиск в словарях и множествах обхода сравнивает их по ссылке
+        intern = sys.intern
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            package, sep, deps_str = line.partition(':')
+            if sep:
+                graph[intern(package.strip())] = [
+                    intern(dep) for dep in map(str.strip, deps_str.split(',')) if dep
+                ]
         
         print(f"Загружено пакетов: {len(graph)}")
+        self._test_graph_cache[file_path] = graph
         return graph
 
     def get_direct_dependencies(self, package_name, version):
@@ -86,195 +249,303 @@ class DependencyVisualizer:
             test_graph = self.load_test_repository(self.config['source'])
             return test_graph.get(package_name, [])
         else:
-            # Заглушка для реального режима
-            mock_dependencies = {
-                "Newtonsoft.Json": ["System.Runtime", "Microsoft.CSharp", "System.Xml"],
-                "EntityFramework": ["EntityFramework.Core", "Microsoft.EntityFrameworkCore"],
-                "NUnit": ["NUnit.Framework", "NUnit.Runners"]
-            }
-            return mock_dependencies.get(package_name, ["System.Runtime"])
-
-    def should_filter_package(self, package_name):
-        if not self.config.get('filter'):
-            return False
-        return self.config['filter'] in package_name
-
-    def bfs_build_dependency_graph(self, start_package, version='latest', path=None):
-        if path is None:
-            path = []
-
-        # ОБНАРУЖЕНИЕ ЦИКЛИЧЕСКИХ ЗАВИСИМОСТЕЙ
-        if start_package in path:
-            cycle_path = ' -> '.join(path + [start_package])
-            print(f"Обнаружена циклическая зависимость: {cycle_path}")
-            self.cycle_detected = True
-            return
+            return MOCK_DEPENDENCIES.get(package_name, DEFAULT_MOCK_DEPENDENCIES)
 
-        if self.recursion_depth > self.max_recursion_depth:
-            print(f"Достигнута максимальная глубина рекурсии для пакета {start_package}")
-            return
-
-        if start_package in self.visited_packages:
-            return
-
-        self.visited_packages.add(start_package)
-        self.recursion_depth += 1
-
-        # ПОЛУЧЕНИЕ ПРЯМЫХ ЗАВИСИМОСТЕЙ
-        dependencies = self.get_direct_dependencies(start_package, version)
+    def bfs_build_dependency_graph(self, start_package, version='latest'):
+        # В тестовом режиме репозиторий читается один раз на весь обход
+        if self.config.get('test_mode'):
+            test_graph = self.load_test_repository(self.config['source'])
+            get_dependencies = lambda package, _version: test_graph.get(package, [])
+        else:
+            get_dependencies = self.get_direct_dependencies
         
-        if self.recursion_depth == 1:
-            print(f"\nПрямые зависимости пакета {start_package}:")
-            for dep in dependencies:
-                print(f"  - {dep}")
-
-        # ФИЛЬТРАЦИЯ ПАКЕТОВ
-        filtered_dependencies = []
-        filter_count = 0
-        for dep in dependencies:
-            if not self.should_filter_package(dep):
-                filtered_dependencies.append(dep)
+        visited = self.visited_packages
+        graph = self.dependency_graph
+        # Предикат фильтра в локальной переменной; без фильтра зависимости просто копируются
+        filter_text = self.config.get('filter')
+        is_filtered = self._filter_fn
+        max_depth = self.max_depth
+        # Элемент очереди: (пакет, версия, глубина)
+        queue = deque([(start_package, version, 0)])
+        popleft = queue.popleft
+        enqueue = queue.extend
+        mark_visited = visited.add
+        
+        while queue:
+            package, package_version, depth = popleft()
+            
+            if package in visited:
+                continue
+            
+            if depth > max_depth:
+                print(f"Достигнута максимальная глубина обхода для пакета {package}")
+                continue
+            
+            mark_visited(package)
+            
+            # ПОЛУЧЕНИЕ ПРЯМЫХ ЗАВИСИМОСТЕЙ
+            dependencies = get_dependencies(package, package_version)
+            
+            if depth == 0:
+                sys.stdout.write(f"\nПрямые зависимости пакета {package}:\n"
+                                 + "".join(f"  - {dep}\n" for dep in dependencies))
+            
+            # ФИЛЬТРАЦИЯ ПАКЕТОВ
+            if filter_text:
+                rejected = [dep for dep in dependencies if is_filtered(dep)]
+                if rejected:
+                    filtered_dependencies = [dep for dep in dependencies if not is_filtered(dep)]
+                    sys.stdout.write("".join(
+                        f"Пакет отфильтрован: {dep}\n" for dep in rejected
+                    ) + f"Отфильтровано пакетов: {len(rejected)}\n")
+                else:
+                    filtered_dependencies = list(dependencies)
             else:
-                filter_count += 1
-                print(f"Пакет отфильтрован: {dep}")
-
-        if filter_count > 0:
-            print(f"Отфильтровано пакетов: {filter_count}")
-
-        self.dependency_graph[start_package] = filtered_dependencies
-
-        # ПОСТРОЕНИЕ ОБРАТНОГО ГРАФА
-        for dep in filtered_dependencies:
-            self.reverse_dependency_graph[dep].append(start_package)
-
-        # РЕКУРСИВНЫЙ ОБХОД
-        new_path = path + [start_package]
-        for dep in filtered_dependencies:
-            self.bfs_build_dependency_graph(dep, 'latest', new_path)
+                filtered_dependencies = list(dependencies)
+            
+            graph[package] = filtered_dependencies
+            
+            # Дети обходятся по уровням, а не рекурсивно
+            enqueue((dep, 'latest', depth + 1) for dep in filtered_dependencies)
+        
+        # ОБНАРУЖЕНИЕ ЦИКЛИЧЕСКИХ ЗАВИСИМОСТЕЙ: один проход по готовому графу
+        cycle = self.detect_cycle(start_package)
+        if cycle:
+            print(f"Обнаружена циклическая зависимость: {' -> '.join(cycle)}")
+            self.cycle_detected = True
 
-        self.recursion_depth -= 1
+    def detect_cycle(self, start_package):
+        """Ищет один цикл, достижимый из start_package (итеративный DFS, три цвета).
+        
+        Возвращает путь от start_package до повторного входа в пакет
+        (последний элемент уже встречается в пути) или None.
+        """
+        graph = self.dependency_graph
+        if start_package not in graph:
+            return None
+        
+        # Серые пакеты лежат на текущем пути (в stack), чёрные обработаны полностью
+        color = {start_package: GRAY}
+        path = [start_package]
+        stack = [iter(graph[start_package])]
+        
+        while stack:
+            for dep in stack[-1]:
+                state = color.get(dep)
+                if state is GRAY:
+                    return path + [dep]
+                if state is None and dep in graph:
+                    color[dep] = GRAY
+                    path.append(dep)
+                    stack.append(iter(graph[dep]))
+                    break
+            else:
+                color[path.pop()] = BLACK
+                stack.pop()
+        
+        return None
 
     def demonstrate_third_stage_operations(self):
-        print("\n" + "="*50)
-        print("ЭТАП 3: ОСНОВНЫЕ ОПЕРАЦИИ С ГРАФОМ")
-        print("="*50)
+        # Отчёт собирается в список и выводится одной записью
+        lines = ["\n" + SEPARATOR, "ЭТАП 3: ОСНОВНЫЕ ОПЕРАЦИИ С ГРАФОМ", SEPARATOR]
+        graph = self.dependency_graph
+        filter_text = self.config.get('filter')
         
         # 1. Анализ графа
-        total_packages = len(self.dependency_graph)
-        total_edges = sum(len(deps) for deps in self.dependency_graph.values())
+        total_packages = len(graph)
+        total_edges = sum(len(deps) for deps in graph.values())
         
-        print(f"Анализ графа:")
-        print(f"  - Всего пакетов: {total_packages}")
-        print(f"  - Всего зависимостей: {total_edges}")
+        lines.append("Анализ графа:")
+        lines.append(f"  - Всего пакетов: {total_packages}")
+        lines.append(f"  - Всего зависимостей: {total_edges}")
         
         # 2. Поиск пакетов без зависимостей (листьев)
-        leaf_packages = [pkg for pkg, deps in self.dependency_graph.items() if not deps]
-        print(f"  - Пакетов без зависимостей: {len(leaf_packages)}")
+        leaf_packages = [pkg for pkg, deps in graph.items() if not deps]
+        lines.append(f"  - Пакетов без зависимостей: {len(leaf_packages)}")
         if leaf_packages:
-            print(f"    {leaf_packages[:3]}{'...' if len(leaf_packages) > 3 else ''}")
+            lines.append(f"    {leaf_packages[:3]}{'...' if len(leaf_packages) > 3 else ''}")
         
         # 3. Поиск пакетов с наибольшим количеством зависимостей
-        if self.dependency_graph:
-            max_deps_package = max(self.dependency_graph.items(), key=lambda x: len(x[1]))
-            print(f"  - Пакет с наибольшим количеством зависимостей: {max_deps_package[0]} ({len(max_deps_package[1])})")
+        if graph:
+            max_deps_package = max(graph.items(), key=lambda x: len(x[1]))
+            lines.append(f"  - Пакет с наибольшим количеством зависимостей: {max_deps_package[0]} ({len(max_deps_package[1])})")
         
         # 4. Анализ циклических зависимостей
         if self.cycle_detected:
-            print("  - Обнаружены циклические зависимости")
+            lines.append("  - Обнаружены циклические зависимости")
         else:
-            print("  - Циклические зависимости не обнаружены")
+            lines.append("  - Циклические зависимости не обнаружены")
         
         # 5. Анализ фильтрации
-        if self.config.get('filter'):
-            filtered_count = sum(1 for pkg in self.dependency_graph.keys() if self.should_filter_package(pkg))
-            print(f"  - Отфильтровано пакетов по '{self.config['filter']}': {filtered_count}")
+        if filter_text:
+            filtered_count = sum(map(self._filter_fn, graph))
+            lines.append(f"  - Отфильтровано пакетов по '{filter_text}': {filtered_count}")
         
         # 6. Глубина графа
-        if self.dependency_graph:
+        if graph:
             root_package = self.config.get('package')
-            if root_package in self.dependency_graph:
+            if root_package in graph:
                 depth = self.calculate_max_depth(root_package)
-                print(f"  - Максимальная глубина графа: {depth} уровней")
+                lines.append(f"  - Максимальная глубина графа: {depth} уровней")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
 
-    def calculate_max_depth(self, package, visited=None, current_depth=1):
-        if visited is None:
-            visited = set()
+    def calculate_max_depth(self, package):
+        """Глубина графа от package в уровнях (сам package - первый уровень).
         
-        if package in visited:
-            return current_depth
-            
-        visited.add(package)
-        max_depth = current_depth
+        Граф сжимается по компонентам сильной связности (итеративный Тарьян),
+        затем длиннейший путь считается одним проходом по полученному DAG.
+        Пакеты одного цикла образуют один уровень.
+        """
+        graph = self.dependency_graph
+        index = {package: 0}
+        low = {package: 0}
+        on_stack = {package}
+        stack = [package]
+        component_of = {}
+        components = []
+        work = [(package, iter(graph.get(package, ())))]
+        
+        while work:
+            node, children = work[-1]
+            for dep in children:
+                if dep not in index:
+                    index[dep] = low[dep] = len(index)
+                    on_stack.add(dep)
+                    stack.append(dep)
+                    work.append((dep, iter(graph.get(dep, ()))))
+                    break
+                if dep in on_stack and index[dep] < low[node]:
+                    low[node] = index[dep]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component_of[member] = len(components)
+                        members.append(member)
+                        if member == node:
+                            break
+                    components.append(members)
+        
+        # Тарьян выдаёт компоненты так, что все достижимые из компоненты
+        # идут раньше неё, поэтому глубины считаются в порядке номеров
+        depths = []
+        for component_id, members in enumerate(components):
+            deepest = 0
+            for member in members:
+                for dep in graph.get(member, ()):
+                    dep_component = component_of[dep]
+                    if dep_component != component_id and depths[dep_component] > deepest:
+                        deepest = depths[dep_component]
+            depths.append(deepest + 1)
         
-        for dep in self.dependency_graph.get(package, []):
-            depth = self.calculate_max_depth(dep, visited.copy(), current_depth + 1)
-            max_depth = max(max_depth, depth)
+        return depths[component_of[package]]
+
+    def get_reverse_graph(self):
+        # Обратный граф строится целиком по готовому прямому графу и только
+        # тогда, когда он нужен: в тестовом режиме - по всему репозиторию
+        # (один раз на файл и фильтр), иначе - по графу, собранному при обходе
+        if not self.config.get('test_mode'):
+            # Прямой граф только растёт, поэтому его размер служит меткой актуальности
+            if self._reverse_graph_size != len(self.dependency_graph):
+                self.reverse_dependency_graph = build_reverse_graph(self.dependency_graph)
+                self._reverse_graph_size = len(self.dependency_graph)
+            return self.reverse_dependency_graph
         
-        return max_depth
+        # Фильтр применяется как при обходе: отфильтрованные пакеты не дают
+        # рёбер ни как зависимости, ни как зависящие пакеты
+        key = (self.config['source'], self.config.get('filter'))
+        reverse_graph = self._test_reverse_cache.get(key)
+        if reverse_graph is None:
+            is_filtered = self._filter_fn
+            graph = self.load_test_repository(key[0])
+            reverse_graph = build_reverse_graph({
+                package: [dep for dep in dependencies if not is_filtered(dep)]
+                for package, dependencies in graph.items() if not is_filtered(package)
+            })
+            self._test_reverse_cache[key] = reverse_graph
+        return reverse_graph
 
     def find_reverse_dependencies(self, target_package):
-        visited = set()
+        reverse_graph = self.get_reverse_graph()
+        # Пакет помечается при постановке в очередь, поэтому попадает в неё один раз
+        visited = {target_package}
         queue = deque([target_package])
         reverse_deps = []
         
         while queue:
             current = queue.popleft()
-            if current in visited:
-                continue
-            visited.add(current)
-            
-            for dependent in self.reverse_dependency_graph.get(current, []):
-                if dependent not in visited and dependent != target_package:
+            for dependent in reverse_graph.get(current, ()):
+                if dependent not in visited:
+                    visited.add(dependent)
                     reverse_deps.append(dependent)
                     queue.append(dependent)
         
         return reverse_deps
 
     def demonstrate_fourth_stage(self, package_name):
-        print("\n" + "="*50)
-        print("ЭТАП 4: ОБРАТНЫЕ ЗАВИСИМОСТИ")
-        print("="*50)
+        print("\n" + SEPARATOR, "ЭТАП 4: ОБРАТНЫЕ ЗАВИСИМОСТИ", SEPARATOR, sep="\n")
         
         reverse_deps = self.find_reverse_dependencies(package_name)
         print(f"Пакеты, зависящие от '{package_name}':")
         if reverse_deps:
-            for dep in reverse_deps:
-                print(f"  - {dep}")
+            sys.stdout.write("".join(f"  - {dep}\n" for dep in reverse_deps))
         else:
             print("  (не найдено)")
 
-    def print_ascii_tree(self, start_package, visited=None, prefix="", is_last=True):
-        if visited is None:
-            visited = set()
+    def print_ascii_tree(self, start_package):
+        graph = self.dependency_graph
+        # Пакеты на текущем пути; снимаются маркером выхода (prefix = None)
+        on_path = set()
+        lines = []
+        stack = [(start_package, "", True)]
         
-        if start_package in visited:
+        while stack:
+            package, prefix, is_last = stack.pop()
+            if prefix is None:
+                on_path.discard(package)
+                continue
+            
             connector = "└── " if is_last else "├── "
-            print(f"{prefix}{connector}{start_package} (цикл)")
-            return
-        
-        visited.add(start_package)
-        connector = "└── " if is_last else "├── "
-        print(f"{prefix}{connector}{start_package}")
+            if package in on_path:
+                lines.append(f"{prefix}{connector}{package} (цикл)\n")
+                continue
+            
+            lines.append(f"{prefix}{connector}{package}\n")
+            on_path.add(package)
+            stack.append((package, None, None))
+            
+            # Дети кладутся в обратном порядке, чтобы выводиться по порядку
+            dependencies = graph.get(package, [])
+            child_prefix = prefix + ("    " if is_last else "│   ")
+            last_index = len(dependencies) - 1
+            for i in range(last_index, -1, -1):
+                stack.append((dependencies[i], child_prefix, i == last_index))
         
-        dependencies = self.dependency_graph.get(start_package, [])
-        for i, dep in enumerate(dependencies):
-            is_last_dep = (i == len(dependencies) - 1)
-            new_prefix = prefix + ("    " if is_last else "│   ")
-            self.print_ascii_tree(dep, visited.copy(), new_prefix, is_last_dep)
+        sys.stdout.write("".join(lines))
 
     def generate_graphviz(self):
-        lines = ['digraph Dependencies {', '    rankdir=TB;', '    node [shape=box, style=filled, fillcolor=lightblue];']
-        
-        edges_added = set()
-        for package, dependencies in self.dependency_graph.items():
-            for dep in dependencies:
-                edge = f'"{package}" -> "{dep}"'
-                if edge not in edges_added:
-                    lines.append(f'    {edge};')
-                    edges_added.add(edge)
+        # Повторы убираются по паре (пакет, зависимость), порядок первого появления сохраняется
+        edges = dict.fromkeys(
+            (package, dep)
+            for package, dependencies in self.dependency_graph.items()
+            for dep in dependencies
+        )
         
-        lines.append('}')
-        return '\n'.join(lines)
+        return '\n'.join((
+            'digraph Dependencies {',
+            '    rankdir=TB;',
+            '    node [shape=box, style=filled, fillcolor=lightblue];',
+            *[f'    "{package}" -> "{dep}";' for package, dep in edges],
+            '}',
+        ))
 
     def save_dot(self, graphviz_content, output_file):
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -282,9 +553,7 @@ class DependencyVisualizer:
         print(f"DOT файл сохранен: {output_file}")
 
     def demonstrate_fifth_stage(self):
-        print("\n" + "="*50)
-        print("ЭТАП 5: ВИЗУАЛИЗАЦИЯ")
-        print("="*50)
+        print("\n" + SEPARATOR, "ЭТАП 5: ВИЗУАЛИЗАЦИЯ", SEPARATOR, sep="\n")
         
         print("Сгенерировано Graphviz представление графа")
         
@@ -297,49 +566,49 @@ class DependencyVisualizer:
             print("-" * 40)
 
     def run(self):
-        try:
-            print("ЗАПУСК ИНСТРУМЕНТА ВИЗУАЛИЗАЦИИ ЗАВИСИМОСТЕЙ")
+        print("ЗАПУСК ИНСТРУМЕНТА ВИЗУАЛИЗАЦИИ ЗАВИСИМОСТЕЙ")
+        
+        # ЭТАП 1: Конфигурация
+        args = parse_arguments()
+        errors = validate_arguments(args)
+        if errors:
+            # Все ошибки одной записью в stderr
+            import os
+            sys.stdout.flush()
+            os.write(2, "".join(f"Ошибка: {error}\n" for error in errors).encode('utf-8'))
+            sys.exit(1)
             
-            # ЭТАП 1: Конфигурация
-            args = self.parse_arguments()
-            errors = self.validate_arguments(args)
-            if errors:
-                for error in errors:
-                    print(f"Ошибка: {error}")
-                return
-                
-            self.config = vars(args)
-            self.print_config(args)
-
-            if args.reverse:
-                # ЭТАП 4: Обратные зависимости
-                print(f"\nПостроение графа для поиска обратных зависимостей...")
-                self.bfs_build_dependency_graph(args.package, args.version)
-                self.demonstrate_third_stage_operations()
-                self.demonstrate_fourth_stage(args.package)
+        self.config = vars(args)
+        self._filter_fn = make_package_filter(args.filter)
+        print_config(args)
+
+        if args.reverse:
+            # ЭТАП 4: Обратные зависимости
+            if args.test_mode:
+                # Обратный граф строится сразу по всему репозиторию;
+                # прямой обход от целевого пакета ничего к нему не добавляет
+                print(f"\nПостроение обратного графа по тестовому репозиторию...")
             else:
-                # Основной режим
-                print(f"\nЭТАП 2: СБОР ДАННЫХ О ЗАВИСИМОСТЯХ")
+                print(f"\nПостроение графа для поиска обратных зависимостей...")
                 self.bfs_build_dependency_graph(args.package, args.version)
-                
-                # ЭТАП 3: Основные операции с графом
                 self.demonstrate_third_stage_operations()
-                
-                # ЭТАП 5: Визуализация
-                self.demonstrate_fifth_stage()
-                
-                # Сохранение DOT
-                graphviz_content = self.generate_graphviz()
-                self.save_dot(graphviz_content, args.output)
-
-            print("\n" + "="*50)
-            print("ВСЕ 5 ЭТАПОВ УСПЕШНО ВЫПОЛНЕНЫ")
-            print("="*50)
-
-        except Exception as e:
-            print(f"Ошибка: {e}")
-            import traceback
-            traceback.print_exc()
+            self.demonstrate_fourth_stage(args.package)
+        else:
+            # Основной режим
+            print(f"\nЭТАП 2: СБОР ДАННЫХ О ЗАВИСИМОСТЯХ")
+            self.bfs_build_dependency_graph(args.package, args.version)
+            
+            # ЭТАП 3: Основные операции с графом
+            self.demonstrate_third_stage_operations()
+            
+            # ЭТАП 5: Визуализация
+            self.demonstrate_fifth_stage()
+            
+            # Сохранение DOT
+            graphviz_content = self.generate_graphviz()
+            self.save_dot(graphviz_content, args.output)
+
+        print("\n" + SEPARATOR, "ВСЕ 5 ЭТАПОВ УСПЕШНО ВЫПОЛНЕНЫ", SEPARATOR, sep="\n")
 
 def create_test_file():
     content = """# ТЕСТОВЫЙ РЕПОЗИТОРИЙ
@@ -364,7 +633,18 @@ Utility:"""
         f.write(content)
     return 'test_repo.txt'
 
+def report_error(exc_type, exc_value, exc_tb):
+    """Обработчик необработанных исключений: сообщение и трассировка."""
+    if issubclass(exc_type, KeyboardInterrupt):
+        sys.__excepthook__(exc_type, exc_value, exc_tb)
+        return
+    print(f"Ошибка: {exc_value}")
+    import traceback
+    traceback.print_exception(exc_type, exc_value, exc_tb)
+
 def main():
+    sys.excepthook = report_error
+    
     if len(sys.argv) == 1:
         print("ДЕМОНСТРАЦИОННЫЙ РЕЖИМ")
         test_file = create_test_file()
@@ -372,26 +652,21 @@ def main():
         visualizer = DependencyVisualizer()
         
         # Тест 1: Основной режим
-        print("\n" + "="*60)
-        print("ТЕСТ 1: ОСНОВНОЙ РЕЖИМ (ЭТАПЫ 1-5)")
-        print("="*60)
+        print("\n" + WIDE_SEPARATOR, "ТЕСТ 1: ОСНОВНОЙ РЕЖИМ (ЭТАПЫ 1-5)", WIDE_SEPARATOR, sep="\n")
         sys.argv = ['prog', '--package', 'A', '--source', test_file, '--test-mode', '--ascii-tree']
         visualizer.run()
         
         # Тест 2: Обратные зависимости
-        print("\n" + "="*60)
-        print("ТЕСТ 2: ОБРАТНЫЕ ЗАВИСИМОСТИ (ЭТАП 4)")
-        print("="*60)
+        print("\n" + WIDE_SEPARATOR, "ТЕСТ 2: ОБРАТНЫЕ ЗАВИСИМОСТИ (ЭТАП 4)", WIDE_SEPARATOR, sep="\n")
         sys.argv = ['prog', '--package', 'B', '--source', test_file, '--test-mode', '--reverse']
         visualizer.run()
         
         # Тест 3: Фильтрация
-        print("\n" + "="*60)
-        print("ТЕСТ 3: ФИЛЬТРАЦИЯ (ЭТАП 3)")
-        print("="*60)
+        print("\n" + WIDE_SEPARATOR, "ТЕСТ 3: ФИЛЬТРАЦИЯ (ЭТАП 3)", WIDE_SEPARATOR, sep="\n")
         sys.argv = ['prog', '--package', 'X', '--source', test_file, '--test-mode', '--filter', 'Test', '--ascii-tree']
         visualizer.run()
         
+        import os
         os.remove(test_file)
         
         print("\nДля работы с реальными пакетами:")
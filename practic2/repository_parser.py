@@ -1,3 +1,4 @@
+import functools
 import urllib.request
 import urllib.parse
 import zipfile
@@ -7,10 +8,12 @@ import os
 from typing import List, Tuple, Optional
 
 
+@functools.lru_cache(maxsize=1024)
 def fetch_nuspec_content(package: str, version: str, repo_url: str) -> str:
     """
     Загружает .nuspec файл пакета из NuGet-репозитория.
     Формат URL: https://api.nuget.org/v3-flatcontainer/{id}/{version}/{id}.nuspec
+    Результат кэшируется: за один запуск каждый .nuspec загружается один раз.
     """
     # Приводим имя пакета к нижнему регистру (NuGet case-insensitive)
     package_lower = package.lower()
@@ -29,37 +32,63 @@ def fetch_nuspec_content(package: str, version: str, repo_url: str) -> str:
         raise RuntimeError(f"Ошибка при загрузке .nuspec: {e}")
 
 
+# Пространство имён .nuspec и полные имена нужных тегов
+NUSPEC_NS = '{http://schemas.microsoft.com/packaging/2013/05/nuspec.xsd}'
+_DEPENDENCIES_TAG = NUSPEC_NS + 'dependencies'
+_GROUP_TAG = NUSPEC_NS + 'group'
+_DEPENDENCY_TAG = NUSPEC_NS + 'dependency'
+
+
 def parse_dependencies_from_nuspec(nuspec_content: str) -> List[Tuple[str, str]]:
     """
     Извлекает прямые зависимости из .nuspec XML.
     Возвращает список кортежей (dependency_id, version_range).
     """
-    try:
-        root = ET.fromstring(nuspec_content)
-
-        # Пространство имён по умолчанию
-        ns = {'ns': 'http://schemas.microsoft.com/packaging/2013/05/nuspec.xsd'}
+    # Быстрый путь: без тега dependency в тексте зависимостей быть не может.
+    # Ищется имя без '<', чтобы не пропустить теги с префиксом пространства имён
+    if 'dependency' not in nuspec_content:
+        return []
 
-        dependencies = []
-        # Ищем все группы зависимостей (обычно одна для netX.Y)
-        dep_groups = root.findall(".//ns:dependencies/ns:group", ns)
-        if not dep_groups:
-            # Возможно, зависимости указаны без групп
-            dep_groups = [root.find(".//ns:dependencies", ns)]
-
-        for group in dep_groups:
-            if group is None:
+    # Потоковый разбор: элементы обрабатываются и очищаются по мере чтения,
+    # дерево целиком не строится
+    grouped = []
+    ungrouped = []
+    has_groups = False
+    first_dependencies = None
+    stack = []
+    try:
+        for event, elem in ET.iterparse(io.StringIO(nuspec_content), events=('start', 'end')):
+            if event == 'start':
+                if first_dependencies is None and elem.tag == _DEPENDENCIES_TAG and stack:
+                    first_dependencies = elem
+                stack.append(elem)
                 continue
-            for dep in group.findall("ns:dependency", ns):
-                dep_id = dep.get("id")
-                version = dep.get("version", "*")
-                if dep_id:
-                    dependencies.append((dep_id, version))
 
-        return dependencies
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if elem.tag == _DEPENDENCY_TAG and parent is not None:
+                if (parent.tag == _GROUP_TAG and len(stack) > 2
+                        and stack[-2].tag == _DEPENDENCIES_TAG):
+                    # Группы зависимостей (обычно одна для netX.Y)
+                    target = grouped
+                elif parent is first_dependencies:
+                    # Зависимости без групп: берётся первый блок <dependencies>
+                    target = ungrouped
+                else:
+                    target = None
+                dep_id = elem.get("id")
+                if target is not None and dep_id:
+                    target.append((dep_id, elem.get("version", "*")))
+            elif (elem.tag == _GROUP_TAG and len(stack) > 1
+                    and parent.tag == _DEPENDENCIES_TAG):
+                has_groups = True
+            if parent is not None:
+                elem.clear()
     except ET.ParseError as e:
         raise RuntimeError(f"Ошибка разбора XML: {e}")
 
+    return grouped if has_groups else ungrouped
+
 
 def get_direct_dependencies(package: str, version: str, repo_url: str) -> List[Tuple[str, str]]:
     """